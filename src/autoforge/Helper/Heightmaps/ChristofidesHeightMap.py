@@ -2,7 +2,7 @@ import random
 from typing import Optional
 
 import numpy as np
-from joblib import Parallel, delayed
+from joblib import Parallel, cpu_count, delayed
 from scipy.spatial.distance import cdist
 from skimage.color import rgb2lab
 from sklearn.cluster import MiniBatchKMeans, KMeans
@@ -494,16 +494,9 @@ def init_height_map(
         random_state=random_seed,
     )
 
-    if lab_space:
-        target_lab_for_quality = rgb2lab((target.astype(np.float32) / 255.0))
-        target_lab_for_quality[..., 0] *= lab_weights[0]
-        target_lab_for_quality[..., 1] *= lab_weights[1]
-        target_lab_for_quality[..., 2] *= lab_weights[2]
-    else:
-        target_lab_for_quality = target.astype(np.float32) / 255.0
-
+    # Same (weighted) Lab image the clustering ran on; no need to convert twice.
     sil_score = segmentation_quality(
-        target_lab_for_quality.reshape(-1, 3),
+        target_lab_reshaped,
         labels,
         sample_size=5000,
         random_state=random_seed,
@@ -538,7 +531,11 @@ def init_height_map(
 
     # Create a mapping that covers all clusters.
     new_values = create_mapping(final_ordering, labs, unique_clusters)
-    new_labels = np.vectorize(lambda x: new_values[x])(labels).astype(np.float32)
+    # Look-up table indexed by cluster label instead of a Python call per pixel.
+    height_lut = np.zeros(max(new_values) + 1, dtype=np.float32)
+    for label, value in new_values.items():
+        height_lut[label] = value
+    new_labels = height_lut[labels]
 
     # Apply focus map boost before converting to logits if provided.
     if focus_map is not None:
@@ -625,6 +622,12 @@ def run_init_threads(
         random_seed = np.random.randint(1e6)
     lab_space = True
 
+    # Rounds are independent CPU-bound k-means runs: one worker per physical
+    # core (hyper-threads just contend for the same FPU), never more than rounds.
+    if num_threads is None or num_threads < 1:
+        num_threads = cpu_count(only_physical_cores=True)
+    num_threads = max(1, min(num_threads, num_runs))
+
     if num_threads > 1:
 
         tasks = [
@@ -645,7 +648,9 @@ def run_init_threads(
             for i in range(num_runs)
         ]
 
-        # Execute tasks in parallel; adjust n_jobs to match your available cores
+        # loky keeps its worker processes alive between calls (e.g. --best_of
+        # runs) and memory-maps large arrays such as the target image instead
+        # of pickling them into every task.
         results = Parallel(n_jobs=num_threads, verbose=10)(tasks)
 
     else:
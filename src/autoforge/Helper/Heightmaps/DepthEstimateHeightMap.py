@@ -1,4 +1,5 @@
 import random
+import threading
 from typing import Optional
 
 import numpy as np
@@ -8,6 +9,31 @@ from sklearn.exceptions import ConvergenceWarning
 from sklearn.metrics import silhouette_score
 from sklearn.utils._testing import ignore_warnings
 
+_DEPTH_MODEL = "depth-anything/Depth-Anything-V2-Small-hf"
+
+# Depth pipelines by model name; loading the weights dominates the depth init,
+# so repeated runs in one process (--best_of, OOM retries) reuse them.
+_depth_pipelines = {}
+_depth_pipelines_lock = threading.Lock()
+
+
+def get_depth_pipeline(model: str = _DEPTH_MODEL):
+    """Return the cached transformers depth-estimation pipeline for ``model``."""
+    with _depth_pipelines_lock:
+        pipe = _depth_pipelines.get(model)
+        if pipe is None:
+            # Local import to avoid making transformers a hard dependency unless this init is used.
+            try:
+                from transformers import pipeline  # type: ignore
+            except Exception as e:
+                raise ImportError(
+                    "Depth initializer requires 'transformers' installed. Install transformers to use --init_heightmap_method depth."
+                ) from e
+
+            pipe = pipeline(task="depth-estimation", model=model)
+            _depth_pipelines[model] = pipe
+        return pipe
+
 
 def initialize_pixel_height_logits(target):
     """
@@ -87,19 +113,9 @@ def init_height_map_depth_color_adjusted(
     # ---------------------------
     # Step 1: Obtain normalized depth map using Depth Anything v2
     # ---------------------------
-    # Local import to avoid making transformers a hard dependency unless this init is used.
-    try:
-        from transformers import pipeline  # type: ignore
-    except Exception as e:
-        raise ImportError(
-            "Depth initializer requires 'transformers' installed. Install transformers to use --init_heightmap_method depth."
-        ) from e
-
     target_uint8 = target.astype(np.uint8)
     image_pil = Image.fromarray(target_uint8)
-    pipe = pipeline(
-        task="depth-estimation", model="depth-anything/Depth-Anything-V2-Small-hf"
-    )
+    pipe = get_depth_pipeline()
     depth_result = pipe(image_pil)
     depth_map = depth_result["depth"]
     if hasattr(depth_map, "convert"):
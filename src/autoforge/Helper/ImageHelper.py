@@ -1,4 +1,7 @@
 import os
+import queue
+import sys
+import threading
 from typing import Sequence
 
 import cv2
@@ -18,6 +21,65 @@ def imwrite(filename: str, img: MatLike, params: Sequence[int] = ()) -> None:
     encoded_img.tofile(filename)
 
 
+def imwrite_atomic(filename: str, img: MatLike, params: Sequence[int] = ()) -> None:
+    """Like imwrite, but readers never see a partially written file."""
+    success, encoded_img = cv2.imencode(os.path.splitext(filename)[1], img, params)
+    if not success:
+        raise OSError(f"cv2 could not write to path {filename}")
+    tmp_filename = filename + ".tmp"
+    encoded_img.tofile(tmp_filename)
+    os.replace(tmp_filename, filename)
+
+
+class AsyncImageWriter:
+    """Encode and write images on a background thread.
+
+    submit() never blocks the caller: while the worker is busy, a newer frame
+    replaces the one still waiting, so only the latest preview gets written.
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue(maxsize=1)
+        self._thread = None
+
+    def submit(self, filename: str, img: MatLike) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        while True:
+            try:
+                self._queue.put_nowait((filename, img))
+                return
+            except queue.Full:
+                # drop the stale pending frame
+                try:
+                    self._queue.get_nowait()
+                    self._queue.task_done()
+                except queue.Empty:
+                    pass
+
+    def close(self) -> None:
+        """Wait for the pending frame to be written and stop the worker."""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                filename, img = item
+                imwrite_atomic(filename, img)
+            except Exception as e:
+                print(f"Warning: could not write {item[0]}: {e}", file=sys.stderr)
+            finally:
+                self._queue.task_done()
+
+
 def resize_image(img, max_size):
     h_img, w_img, _ = img.shape
 
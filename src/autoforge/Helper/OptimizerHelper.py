@@ -5,6 +5,20 @@ import torch.nn.functional as F
 from autoforge.Helper.AmpUtils import get_selected_autocast
 
 
+def _adaptive_round_blend(x, tau, high_tau: float, low_tau: float, temp: float):
+    """Branch-free adaptive_round for a tensor tau (--compile / --cuda_graphs).
+
+    Clamping the blend ratio to [0, 1] gives exactly the hard or soft rounding
+    at the ends, without a data-dependent branch on tau.
+    """
+    ratio = torch.clamp((tau - low_tau) / (high_tau - low_tau), 0.0, 1.0)
+    hard_round = torch.round(x)
+    floor_val = torch.floor(x)
+    diff = x - floor_val
+    soft_round = floor_val + torch.sigmoid((diff - 0.5) / temp)
+    return ratio * soft_round + (1 - ratio) * hard_round
+
+
 @torch.jit.script
 def adaptive_round(
     x: torch.Tensor, tau: float, high_tau: float, low_tau: float, temp: float
@@ -22,6 +36,11 @@ def adaptive_round(
     Returns:
         torch.Tensor: The rounded tensor.
     """
+    if not torch.jit.is_scripting():
+        # Only reached when torch.compile traces the Python source, where the
+        # optimizer passes tau as a device scalar.
+        if isinstance(tau, torch.Tensor):
+            return _adaptive_round_blend(x, tau, high_tau, low_tau, temp)
     if tau <= low_tau:
         return torch.round(x)
     elif tau >= high_tau:
@@ -98,6 +117,42 @@ def deterministic_gumbel_softmax(
     return y
 
 
+@torch.jit.script
+def deterministic_gumbel_argmax(
+    logits: torch.Tensor, tau: float, seed_base: int
+) -> torch.Tensor:
+    """
+    Row-wise hard choice of `deterministic_gumbel_softmax` for a [L, M] logits tensor.
+
+    Row j uses the seed `seed_base + j`, so the result matches calling
+    `argmax(deterministic_gumbel_softmax(logits[j], tau, True, seed_base + j))`
+    for every row, but runs as a few batched kernels without per-row host syncs.
+
+    Args:
+        logits (torch.Tensor): The input logits tensor of shape [L, M].
+        tau (float): The temperature parameter for the Gumbel-Softmax.
+        seed_base (int): Seed of the first row.
+
+    Returns:
+        torch.Tensor: int64 tensor of shape [L] with the chosen index per row.
+    """
+    eps: float = 1e-20
+    L: int = int(logits.shape[0])
+    M: int = int(logits.shape[1])
+    # Same hash as deterministic_rand_like, with one seed offset per row.
+    seeds = (
+        torch.arange(L, dtype=torch.int64, device=logits.device) + seed_base
+    ).to(torch.float32)
+    indices = torch.arange(M, dtype=torch.float32, device=logits.device).view(
+        1, -1
+    ) + seeds.view(-1, 1)
+    r = torch.sin(indices) * 43758.5453123
+    U = r - torch.floor(r)
+    gumbel_noise = -torch.log(-torch.log(U + eps) + eps)
+    y = (logits + gumbel_noise) / tau
+    return torch.argmax(F.softmax(y, dim=-1), dim=-1)
+
+
 @torch.jit.script
 def bleed_layer_effect(mask: torch.Tensor, strength: float = 0.1) -> torch.Tensor:
     """
@@ -225,29 +280,23 @@ def _runs_from_materials(mats: torch.Tensor):
 
 
 @torch.jit.script
-def composite_image_disc(
+def composite_image_disc_layers(
     pixel_height_logits: torch.Tensor,  # [H,W]
-    global_logits: torch.Tensor,  # [max_layers, n_materials]
+    layer_materials: torch.Tensor,  # [B, max_layers] int64
     tau_height: float,
-    tau_global: float,
     h: float,
     max_layers: int,
     material_colors: torch.Tensor,  # [n_materials, 3]
     material_TDs: torch.Tensor,  # [n_materials]
     background: torch.Tensor,  # [3]
-    rng_seed: int = -1,
 ) -> torch.Tensor:
     """
-    Discrete counterpart of `composite_image_cont`.
+    Discrete compositing for a batch of fixed per-layer material assignments.
 
-    * Heights are snapped to whole layers with `adaptive_round`.
-    * Each layer gets exactly one material chosen with
-      `deterministic_gumbel_softmax`, making the result pixel-wise
-      discrete in both height and color while gradients still flow
-      through the soft procedures when temperatures are >0.
+    All B candidates share the same height map, so the discretised heights and
+    the print mask are computed once; only colors and opacities carry the batch
+    dimension. Returns a [B,H,W,3] tensor.
     """
-    eps: float = 1e-8
-
     # 1. Discretise per-pixel heights (top of printed stack in units of h).
     pixel_height: torch.Tensor = (float(max_layers) * h) * torch.sigmoid(
         pixel_height_logits
@@ -260,27 +309,10 @@ def composite_image_disc(
     z_disc = torch.clamp(z_disc, 0.0, float(max_layers))
     z_int: torch.Tensor = torch.round(z_disc).to(torch.int64)  # [H, W]
 
-    # 2. Pick one material for every layer with a deterministic Gumbel-Softmax.
-    L: int = int(global_logits.shape[0])
-    n_mat: int = int(global_logits.shape[1])
-
-    layer_colors: torch.Tensor = torch.empty(
-        (L, 3), dtype=material_colors.dtype, device=material_colors.device
-    )
-    layer_TDs: torch.Tensor = torch.empty(
-        (L,), dtype=material_TDs.dtype, device=material_TDs.device
-    )
-
-    seed_base: int = rng_seed if rng_seed >= 0 else 0
-    hard_flag: bool = True  # always one-hot
-    for j in range(L):
-        seed_j: int = seed_base + j
-        one_hot: torch.Tensor = deterministic_gumbel_softmax(
-            global_logits[j], tau_global, hard_flag, seed_j
-        )  # [n_materials]
-        idx: int = int(torch.argmax(one_hot).item())
-        layer_colors[j] = material_colors[idx]
-        layer_TDs[j] = material_TDs[idx].clamp(1e-8, 1e8)
+    # 2. Per-candidate layer colors and transmission distances.
+    B: int = int(layer_materials.shape[0])
+    layer_colors: torch.Tensor = material_colors[layer_materials]  # [B,L,3]
+    layer_TDs: torch.Tensor = material_TDs[layer_materials].clamp(1e-8, 1e8)  # [B,L]
 
     # 3. Binary print mask: a layer is present iff its index < z_int.
     layer_idx: torch.Tensor = torch.arange(
@@ -293,32 +325,75 @@ def composite_image_disc(
     # 4. Thickness, opacity and the rest exactly as in the continuous version.
     p_print_bleed = bleed_layer_effect(p_print, strength=0.1)  # [L,H,W]
     eff_thick = torch.clamp(p_print_bleed, 0.0, 1.0) * h
-    thick_ratio: torch.Tensor = eff_thick / layer_TDs.view(-1, 1, 1)  # [L,H,W]
+    thick_ratio: torch.Tensor = eff_thick.unsqueeze(0) / layer_TDs.view(
+        B, -1, 1, 1
+    )  # [B,L,H,W]
 
     o, A, k, b = -1.2416557e-02, 9.6407950e-01, 3.4103447e01, -4.1554203e00
     opac: torch.Tensor = o + (A * torch.log1p(k * thick_ratio) + b * thick_ratio)
-    opac = torch.clamp(opac, 0.0, 1.0)  # [L,H,W]
+    opac = torch.clamp(opac, 0.0, 1.0)  # [B,L,H,W]
 
     # 5. Top-to-bottom compositing (same flipping trick as before).
-    opac_fb = torch.flip(opac, dims=[0])  # [L,H,W]
-    colors_fb = torch.flip(layer_colors, dims=[0])  # [L,3]
+    opac_fb = torch.flip(opac, dims=[1])  # [B,L,H,W]
+    colors_fb = torch.flip(layer_colors, dims=[1])  # [B,L,3]
 
-    trans_fb = 1.0 - opac_fb  # [L,H,W]
-    trans_prev = torch.cat([torch.ones_like(trans_fb[:1]), trans_fb[:-1]], dim=0)
-    remain_fb = torch.cumprod(trans_prev, dim=0)  # [L,H,W]
+    trans_fb = 1.0 - opac_fb  # [B,L,H,W]
+    trans_prev = torch.cat(
+        [torch.ones_like(trans_fb[:, :1]), trans_fb[:, :-1]], dim=1
+    )
+    remain_fb = torch.cumprod(trans_prev, dim=1)  # [B,L,H,W]
 
     comp_layers = (remain_fb * opac_fb).unsqueeze(-1) * colors_fb.view(
-        -1, 1, 1, 3
-    )  # [L,H,W,3]
-    comp = comp_layers.sum(dim=0)  # [H,W,3]
+        B, -1, 1, 1, 3
+    )  # [B,L,H,W,3]
+    comp = comp_layers.sum(dim=1)  # [B,H,W,3]
 
     # 6. Background
-    rem_after = remain_fb[-1] * trans_fb[-1]
-    comp = comp + rem_after.unsqueeze(-1) * background  # [H,W,3]
+    rem_after = remain_fb[:, -1] * trans_fb[:, -1]
+    comp = comp + rem_after.unsqueeze(-1) * background  # [B,H,W,3]
 
     return comp * 255.0
 
 
+@torch.jit.script
+def composite_image_disc(
+    pixel_height_logits: torch.Tensor,  # [H,W]
+    global_logits: torch.Tensor,  # [max_layers, n_materials]
+    tau_height: float,
+    tau_global: float,
+    h: float,
+    max_layers: int,
+    material_colors: torch.Tensor,  # [n_materials, 3]
+    material_TDs: torch.Tensor,  # [n_materials]
+    background: torch.Tensor,  # [3]
+    rng_seed: int = -1,
+) -> torch.Tensor:
+    """
+    Discrete counterpart of `composite_image_cont`.
+
+    * Heights are snapped to whole layers with `adaptive_round`.
+    * Each layer gets exactly one material chosen with
+      `deterministic_gumbel_softmax`, making the result pixel-wise
+      discrete in both height and color while gradients still flow
+      through the soft procedures when temperatures are >0.
+    """
+    # Pick one material for every layer with a deterministic Gumbel-Softmax.
+    seed_base: int = rng_seed if rng_seed >= 0 else 0
+    mat_idx: torch.Tensor = deterministic_gumbel_argmax(
+        global_logits, tau_global, seed_base
+    )  # [L]
+    return composite_image_disc_layers(
+        pixel_height_logits,
+        mat_idx.unsqueeze(0),
+        tau_height,
+        h,
+        max_layers,
+        material_colors,
+        material_TDs,
+        background,
+    )[0]
+
+
 def _gpu_capability(device):
     major, minor = torch.cuda.get_device_capability(device)
     return major * 10 + minor  # 80, 61, …
@@ -347,12 +422,12 @@ class PrecisionManager:
         # Decide dtype once using the shared runtime probe
         dtype, _reason = get_selected_autocast(device)
         self.autocast_dtype = dtype
-        # Enable only when a non-None dtype is selected and device supports native CUDA autocast
-        self.enabled = dtype is not None and device.type == "cuda"
+        # Enable whenever the probe selected a dtype (never on MPS, see AmpUtils)
+        self.enabled = dtype is not None
 
         # Use GradScaler only for CUDA float16; bf16 does not need scaling
-        if self.enabled and dtype == torch.float16:
-            self.scaler = torch.cuda.amp.GradScaler()
+        if self.enabled and device.type == "cuda" and dtype == torch.float16:
+            self.scaler = torch.amp.GradScaler("cuda")
         else:
             self.scaler = None
 
@@ -367,7 +442,9 @@ class PrecisionManager:
     @contextmanager
     def autocast(self):
         if self.enabled:
-            with torch.cuda.amp.autocast(dtype=self.autocast_dtype):
+            with torch.autocast(
+                device_type=self.device.type, dtype=self.autocast_dtype
+            ):
                 yield
         else:
             yield  # FP32 path
@@ -1,3 +1,4 @@
+import gc
 import os
 import sys
 import time
@@ -44,11 +45,64 @@ def perform_basic_check(args):
 
 
 def get_device(args) -> torch.device:
-    if torch.cuda.is_available():
+    """Resolve the torch device from --device (and the legacy --mps flag).
+
+    'auto' prefers CUDA, then Apple MPS, then CPU.
+    """
+    requested = getattr(args, "device", "auto")
+    if getattr(args, "mps", False) and requested == "auto":
+        requested = "mps"
+
+    mps_available = torch.backends.mps.is_available() and torch.backends.mps.is_built()
+    if requested == "cuda" and not torch.cuda.is_available():
+        print(
+            "Warning: CUDA requested but not available, falling back.",
+            file=sys.stderr,
+        )
+        requested = "auto"
+    if requested == "mps" and not mps_available:
+        print(
+            "Warning: MPS requested but not available, falling back.",
+            file=sys.stderr,
+        )
+        requested = "auto"
+
+    if requested != "auto":
+        device = torch.device(requested)
+    elif torch.cuda.is_available():
         device = torch.device("cuda")
-    elif args.mps and torch.backends.mps.is_available():
+    elif mps_available:
         device = torch.device("mps")
     else:
         device = torch.device("cpu")
     print("Using device:", device)
     return device
+
+
+def free_device_memory() -> None:
+    """Collect garbage and hand cached CUDA / MPS allocator blocks back to the driver."""
+    gc.collect()
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+    if torch.backends.mps.is_available():
+        torch.mps.empty_cache()
+
+
+def to_device(
+    array, device: torch.device, dtype: torch.dtype = torch.float32
+) -> torch.Tensor:
+    """Upload a NumPy array (or sequence) to *device* as *dtype*.
+
+    Unlike torch.tensor() this wraps the array without an intermediate host
+    copy before the upload. Inputs narrower than *dtype* (e.g. uint8 images)
+    are cast after the transfer so they cross the bus at their own size; all
+    others are cast on the host first, which also keeps float64 off devices
+    without float64 support such as MPS. On the CPU the result is always a
+    copy, never a view of *array*.
+    """
+    t = torch.from_numpy(np.ascontiguousarray(array))
+    if device.type == "cpu":
+        return t.to(dtype=dtype, copy=True)
+    if t.element_size() < dtype.itemsize:
+        return t.to(device).to(dtype)
+    return t.to(dtype).to(device)
@@ -401,7 +401,27 @@ def generate_stl(
     # Load the mesh from the in-memory buffer using trimesh.
     mesh: Trimesh = trimesh.load(buffer, file_type="stl")
     mesh.merge_vertices()
-    mesh.export(filename)
+    _export_stl_atomic(mesh, filename)
+
+
+def _export_stl_atomic(mesh, filename):
+    """
+    Write an STL so that it only appears under its final name once complete.
+
+    The data goes to ``<filename>.partial`` first and is then renamed, so slicers
+    or anything watching the output folder never pick up a half-written mesh.
+
+    Args:
+        mesh (Trimesh | bytes): Mesh to export, or raw binary STL bytes.
+        filename (str): Output filename.
+    """
+    partial_filename = os.fspath(filename) + ".partial"
+    if isinstance(mesh, bytes):
+        with open(partial_filename, "wb") as f:
+            f.write(mesh)
+    else:
+        mesh.export(partial_filename, file_type="stl")
+    os.replace(partial_filename, filename)
 
 
 def generate_swap_instructions(
@@ -522,32 +542,20 @@ def generate_flatforge_stls(
     print(f"Selected clear material: {material_names[most_transparent_idx]} (TD: {material_TDs_np[most_transparent_idx]:.2f})")
     
     # Create a 3D array: [layer, height, width] where each entry indicates which material is at that position
-    # Initialize with -1 (no material)
-    layer_materials = np.full((max_layer, H, W), -1, dtype=int)
-    
-    # For each pixel, assign materials to layers based on disc_height_image and disc_global
-    for i in range(H):
-        for j in range(W):
-            if not valid_mask[i, j]:
-                continue
-            
-            pixel_height = int(disc_height_image[i, j])
-            
-            # Assign materials from layer 0 to min(pixel_height, max_layer)-1
-            # Fill any gaps in disc_global by extending the last color from below
-            # This ensures there's no clear between two colored layers
-            last_color = -1
-            for layer in range(min(pixel_height, max_layer)):
-                material = int(disc_global[layer])
-                if material >= 0:
-                    # This layer has a color assigned
-                    last_color = material
-                    layer_materials[layer, i, j] = material
-                elif last_color >= 0:
-                    # This layer is a gap in disc_global, extend the color from below
-                    # This prevents clear from being placed between two colored layers
-                    layer_materials[layer, i, j] = last_color
-                # else: both material and last_color are -1, leave as -1
+    # (-1 means no material). Gaps in disc_global are filled by extending the last color from below.
+    # This ensures there's no clear between two colored layers, and since the
+    # fill only depends on the layer it is computed once for all pixels.
+    layer_colors = np.asarray(disc_global[:max_layer]).astype(int)
+    last_colored = np.where(layer_colors >= 0, np.arange(max_layer), -1)
+    last_colored = np.maximum.accumulate(last_colored)
+    layer_colors = np.where(last_colored >= 0, layer_colors[last_colored], -1)
+
+    # A pixel holds layers 0 .. pixel_height-1
+    pixel_heights = disc_height_image.astype(int)
+    occupied = (
+        np.arange(max_layer)[:, None, None] < pixel_heights[None]
+    ) & valid_mask[None]
+    layer_materials = np.where(occupied, layer_colors[:, None, None], -1)
     
     # Get unique materials used (excluding background)
     unique_materials = np.unique(disc_global[:max_layer])
@@ -565,33 +573,22 @@ def generate_flatforge_stls(
         material_mask_3d = (layer_materials == material_idx)
         
         # Create a height map for this material
-        # For each pixel, find the maximum layer that uses this material
-        height_map = np.zeros((H, W), dtype=float)
-        min_height_map = np.full((H, W), max_layer + cap_layers, dtype=float)
-        
-        has_material = False
-        for layer in range(max_layer):
-            for i in range(H):
-                for j in range(W):
-                    if material_mask_3d[layer, i, j]:
-                        has_material = True
-                        # Track the highest layer this material appears at this pixel
-                        if layer + 1 > height_map[i, j]:
-                            height_map[i, j] = layer + 1
-                        # Track the lowest layer this material appears at this pixel
-                        if layer < min_height_map[i, j]:
-                            min_height_map[i, j] = layer
-        
-        if not has_material:
+        # For each pixel, find the highest and lowest layer that use this material
+        material_mask_2d = np.any(material_mask_3d, axis=0)
+        if not np.any(material_mask_2d):
             return None
+
+        top_layer = max_layer - np.argmax(material_mask_3d[::-1], axis=0)
+        bottom_layer = np.argmax(material_mask_3d, axis=0)
+        height_map = np.where(material_mask_2d, top_layer, 0).astype(float)
+        min_height_map = np.where(
+            material_mask_2d, bottom_layer, max_layer + cap_layers
+        ).astype(float)
         
         # Convert to mm (layers to mm)
         height_map_mm = height_map * layer_height
         min_height_map_mm = min_height_map * layer_height
         
-        # Create a 2D mask indicating which pixels have this material (at any layer)
-        material_mask_2d = np.any(material_mask_3d, axis=0)
-        
         # Create vertices for the box
         # We need to create a rectangular box where z goes from min to max for each pixel
         filename = os.path.join(output_folder, f"{material_name}_{color_hex.lstrip('#')}.stl")
@@ -627,23 +624,12 @@ def generate_flatforge_stls(
     print("Generating FlatForge STL for clear areas...")
     
     # Find positions where clear is needed (above all colored materials)
-    clear_height_map = np.zeros((H, W), dtype=float)
-    clear_min_height_map = np.full((H, W), max_layer, dtype=float)
-    
-    has_clear = False
-    for i in range(H):
-        for j in range(W):
-            if not valid_mask[i, j]:
-                continue
-            
-            pixel_height = int(disc_height_image[i, j])
-            
-            # If pixel height is less than max_layer, fill the top with clear
-            if pixel_height < max_layer:
-                has_clear = True
-                clear_min_height_map[i, j] = pixel_height
-                clear_height_map[i, j] = max_layer
-            # Note: We don't check layer_materials because gaps are already filled with colors
+    # If pixel height is less than max_layer, fill the top with clear
+    # Note: We don't check layer_materials because gaps are already filled with colors
+    needs_clear = valid_mask & (pixel_heights < max_layer)
+    has_clear = bool(np.any(needs_clear))
+    clear_height_map = np.where(needs_clear, max_layer, 0).astype(float)
+    clear_min_height_map = np.where(needs_clear, pixel_heights, max_layer).astype(float)
     
     if has_clear:
         clear_height_map_mm = clear_height_map * layer_height
@@ -915,10 +901,8 @@ def _save_stl_with_manifold_fix(triangles, filename):
         mesh.remove_duplicate_faces()
         mesh.fill_holes()
         mesh.fix_normals()
-        mesh.export(filename)
+        _export_stl_atomic(mesh, filename)
     except Exception as e:
         print(f"Warning: Error fixing manifold for {filename}: {e}")
         # Fall back to saving without manifold fix
-        with open(filename, "wb") as f:
-            buffer.seek(0)
-            f.write(buffer.read())
+        _export_stl_atomic(buffer.getvalue(), filename)
@@ -13,6 +13,13 @@ from autoforge.Modules.Optimizer import FilamentOptimizer
 # One global lock that serialises every call that needs GPU / VRAM
 _gpu_lock = threading.Lock()
 
+# Upper bound for B * layers * H * W when compositing candidates in one batch.
+# composite_image_disc_layers keeps about ten float32 [B,L,H,W]-sized tensors
+# alive at its peak (opacity, transmission and cumprod intermediates plus the
+# 3-channel per-layer colors), so 2**24 elements (64 MB each) peak at roughly
+# 640 MB, traded against far fewer kernel launches than scoring one at a time.
+_BATCH_ELEMENT_BUDGET = 2**24
+
 
 def disc_to_logits(
     dg: torch.Tensor, num_materials: int, big_pos: float = 1e5
@@ -42,12 +49,32 @@ def _chunked(iterable, chunk_size):
         yield iterable[i : i + chunk_size]
 
 
+def score_global_candidates(optimizer, candidates: list) -> list:
+    """Return the loss of every discrete global assignment in *candidates*.
+
+    All candidates share the best height map and only differ in their per-layer
+    materials, so they are composited together in batches (bounded by
+    _BATCH_ELEMENT_BUDGET) instead of one GPU pass per candidate.
+    """
+    H, W = optimizer.target.shape[:2]
+    batch_size = max(1, _BATCH_ELEMENT_BUDGET // max(1, optimizer.max_layers * H * W))
+    losses = []
+    for batch in _chunked(candidates, batch_size):
+        with _gpu_lock, torch.no_grad():
+            comps = optimizer.get_best_discretized_images(torch.stack(batch))
+            batch_losses = torch.stack(
+                [compute_loss(comp=comp, target=optimizer.target) for comp in comps]
+            )
+        losses.extend(batch_losses.tolist())
+    return losses
+
+
 def prune_num_colors(
     optimizer: FilamentOptimizer,
     max_colors_allowed: int,
     tau_for_comp: float,  # kept for API compatibility
     perception_loss_module: torch.nn.Module,  # kept for API compatibility
-    n_jobs: int | None = -1,  # how many workers joblib should start
+    n_jobs: int | None = -1,  # kept for API compatibility; candidates are scored in batches
     *,
     fast: bool = True,  # enable incremental search
     chunking_percent=0.05,  # percentage of layers to process at once
@@ -64,29 +91,13 @@ def prune_num_colors(
     num_materials = optimizer.material_colors.shape[0]
     disc_global, _ = optimizer.get_discretized_solution(best=True)
 
-    def score_color(
-        dg_base: torch.Tensor, c_from: int, c_to: int
-    ) -> tuple[float, torch.Tensor]:
-        dg_test = merge_color(dg_base, c_from, c_to)
-        logits_for_disc = disc_to_logits(dg_test, num_materials, big_pos=1e5)
-        with _gpu_lock, torch.no_grad():
-            out_im = optimizer.get_best_discretized_image(
-                custom_global_logits=logits_for_disc
-            )
-            loss = compute_loss(comp=out_im, target=optimizer.target)
-        return loss, dg_test
-
-    def get_image_loss(dg_test: torch.Tensor) -> float:
-        logits_for_disc = disc_to_logits(dg_test, num_materials, big_pos=1e5)
-        with _gpu_lock, torch.no_grad():
-            out_im = optimizer.get_best_discretized_image(
-                custom_global_logits=logits_for_disc
-            )
-            loss = compute_loss(comp=out_im, target=optimizer.target)
-        return loss
+    def score_merges(dg_base: torch.Tensor, pairs) -> tuple[float, torch.Tensor]:
+        cand_dgs = [merge_color(dg_base, c_from, c_to) for c_from, c_to in pairs]
+        cand_losses = score_global_candidates(optimizer, cand_dgs)
+        return min(zip(cand_losses, cand_dgs), key=lambda x: x[0])
 
     best_dg = disc_global.clone()
-    best_loss = get_image_loss(best_dg)
+    best_loss = score_global_candidates(optimizer, [best_dg])[0]
 
     tbar = tqdm(total=100, leave=False)
     while True:
@@ -113,10 +124,7 @@ def prune_num_colors(
             c_cand = None
             c_loss = 1000
             for chunk in _chunked(merge_pairs, chunk_size):
-                cand_results = Parallel(
-                    n_jobs=n_jobs, backend="threading", prefer="threads"
-                )(delayed(score_color)(best_dg, *pair) for pair in chunk)
-                merge_loss, merge_dg = min(cand_results, key=lambda x: x[0])
+                merge_loss, merge_dg = score_merges(best_dg, chunk)
                 if merge_loss < best_loss * (1 + allowed_loss_increase_percent):
                     best_dg, best_loss = merge_dg, merge_loss
                     improved = True
@@ -140,10 +148,7 @@ def prune_num_colors(
             if not improved:
                 break  # no chunk provided improvement and we are within budget
         else:
-            cand_results = Parallel(
-                n_jobs=n_jobs, backend="threading", prefer="threads"
-            )(delayed(score_color)(best_dg, *pair) for pair in merge_pairs)
-            merge_loss, merge_dg = min(cand_results, key=lambda x: x[0])
+            merge_loss, merge_dg = score_merges(best_dg, merge_pairs)
             if merge_loss < best_loss or len(distinct_mats) > max_colors_allowed:
                 best_dg, best_loss = merge_dg, merge_loss
             else:
@@ -161,7 +166,7 @@ def prune_num_swaps(
     max_swaps_allowed: int,
     tau_for_comp: float,  # kept for API compatibility
     perception_loss_module: torch.nn.Module,  # kept for API compatibility
-    n_jobs: int | None = -1,  # how many workers joblib should start
+    n_jobs: int | None = -1,  # kept for API compatibility; candidates are scored in batches
     *,
     fast: bool = True,  # enable incremental search
     chunking_percent=0.05,  # percentage of layers to process at once
@@ -175,27 +180,16 @@ def prune_num_swaps(
     num_materials = optimizer.material_colors.shape[0]
     disc_global, _ = optimizer.get_discretized_solution(best=True)
 
-    def get_image_loss(dg_test: torch.Tensor) -> float:
-        logits_for_disc = disc_to_logits(dg_test, num_materials, big_pos=1e5)
-        with _gpu_lock, torch.no_grad():
-            out_im = optimizer.get_best_discretized_image(
-                custom_global_logits=logits_for_disc
-            )
-            loss = compute_loss(comp=out_im, target=optimizer.target)
-        return loss
-
-    def score_swap(dg_base: torch.Tensor, band_a, band_b, direction: str):
-        dg_test = merge_bands(dg_base, band_a, band_b, direction=direction)
-        logits_for_disc = disc_to_logits(dg_test, num_materials, big_pos=1e5)
-        with _gpu_lock, torch.no_grad():
-            out_im = optimizer.get_best_discretized_image(
-                custom_global_logits=logits_for_disc
-            )
-            loss = compute_loss(comp=out_im, target=optimizer.target)
-        return loss, dg_test
+    def score_merges(dg_base: torch.Tensor, specs) -> tuple[float, torch.Tensor]:
+        cand_dgs = [
+            merge_bands(dg_base, band_a, band_b, direction=direction)
+            for band_a, band_b, direction in specs
+        ]
+        cand_losses = score_global_candidates(optimizer, cand_dgs)
+        return min(zip(cand_losses, cand_dgs), key=lambda x: x[0])
 
     best_dg = disc_global.clone()
-    best_loss = get_image_loss(best_dg)
+    best_loss = score_global_candidates(optimizer, [best_dg])[0]
 
     tbar = tqdm(total=100, leave=False)
     while True:
@@ -226,13 +220,7 @@ def prune_num_swaps(
             c_cand = None
             c_loss = 10000
             for chunk in _chunked(merge_specs, chunk_size):
-                cand_results = Parallel(
-                    n_jobs=n_jobs, backend="threading", prefer="threads"
-                )(
-                    delayed(score_swap)(best_dg, band_a, band_b, direction)
-                    for band_a, band_b, direction in chunk
-                )
-                merge_loss, merge_dg = min(cand_results, key=lambda x: x[0])
+                merge_loss, merge_dg = score_merges(best_dg, chunk)
                 if merge_loss < best_loss * (1 + allowed_loss_increase_percent):
                     best_dg, best_loss = merge_dg, merge_loss
                     improved = True
@@ -255,13 +243,7 @@ def prune_num_swaps(
             if not improved:
                 break
         else:
-            cand_results = Parallel(
-                n_jobs=n_jobs, backend="threading", prefer="threads"
-            )(
-                delayed(score_swap)(best_dg, band_a, band_b, direction)
-                for band_a, band_b, direction in merge_specs
-            )
-            merge_loss, merge_dg = min(cand_results, key=lambda x: x[0])
+            merge_loss, merge_dg = score_merges(best_dg, merge_specs)
             if merge_loss < best_loss or num_swaps > max_swaps_allowed:
                 best_dg, best_loss = merge_dg, merge_loss
             else:
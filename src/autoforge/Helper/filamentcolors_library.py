@@ -81,14 +81,18 @@ def download_all_pages(url):
         requests.RequestException: If any of the requests to the URL fail.
     """
     all_results = []
-    tbar = tqdm(desc="Downloading", unit=" swatches page")
-    while url:
-        response = requests.get(url, timeout=TIMEOUT)
-        response.raise_for_status()
-        data = response.json()
-        all_results.extend(data.get("results", []))
-        url = data.get("next")
-        tbar.update(1)
+    # One session for all pages: the connection (and TLS handshake) is reused
+    # instead of being re-established for every page.
+    with requests.Session() as session, tqdm(
+        desc="Downloading", unit=" swatches page"
+    ) as tbar:
+        while url:
+            response = session.get(url, timeout=TIMEOUT)
+            response.raise_for_status()
+            data = response.json()
+            all_results.extend(data.get("results", []))
+            url = data.get("next")
+            tbar.update(1)
     return all_results
 
 
@@ -1,5 +1,6 @@
 import argparse
 import random
+import sys
 from typing import Optional
 
 import matplotlib.pyplot as plt
@@ -9,10 +10,13 @@ from torch.utils.tensorboard import SummaryWriter
 from tqdm import tqdm
 
 from autoforge.Helper.CAdamW import CAdamW
+from autoforge.Helper.ImageHelper import AsyncImageWriter
+from autoforge.Helper.OtherHelper import free_device_memory
 from autoforge.Helper.OptimizerHelper import (
     composite_image_cont,
     composite_image_disc,
-    deterministic_gumbel_softmax,
+    composite_image_disc_layers,
+    deterministic_gumbel_argmax,
     PrecisionManager,
 )
 
@@ -54,6 +58,31 @@ class FilamentOptimizer:
 
         self.precision = PrecisionManager(device)
 
+        # Optionally compile the continuous forward + loss with Inductor.
+        # --cuda_graphs additionally replays it as a CUDA graph.
+        self._loss_fn = loss_fn
+        self._tau_buf = None
+        self._cuda_graphs = False
+        cuda_graphs = getattr(args, "cuda_graphs", False)
+        if cuda_graphs or getattr(args, "compile", False):
+            if device.type == "cuda":
+                # Shapes are fixed for a run; the annealed temperatures are fed
+                # as device scalars (see step) so they are graph inputs rather
+                # than guarded constants and a single graph serves every step.
+                self._loss_fn = torch.compile(
+                    loss_fn,
+                    mode="reduce-overhead" if cuda_graphs else None,
+                    dynamic=False,
+                )
+                self._tau_buf = torch.ones(2, device=device)
+                self._cuda_graphs = cuda_graphs
+            else:
+                flag = "--cuda_graphs" if cuda_graphs else "--compile"
+                print(
+                    f"Warning: {flag} is only supported on CUDA, running eagerly.",
+                    file=sys.stderr,
+                )
+
         pixel_height_labels = np.round(pixel_height_labels)
 
         # replace entire entries of pixel_height_logits with 0
@@ -175,6 +204,8 @@ class FilamentOptimizer:
             if self.args.disable_visualization_for_gradio != 1:
                 plt.ion()
             self.fig, self.ax = plt.subplots(2, 3, figsize=(14, 6))
+            self._vis_writer = AsyncImageWriter()
+            self._preview_bufs = {}
 
             self.target_im_ax = self.ax[0, 0].imshow(
                 np.array(self.target.cpu(), dtype=np.uint8)
@@ -277,15 +308,30 @@ class FilamentOptimizer:
             )
             return t, t
 
-    def step(self, record_best: bool = False):
+    @property
+    def loss(self) -> Optional[float]:
+        """Loss of the most recent step. Only the first read after a step syncs with the device."""
+        if self._loss_value is None and self._loss_tensor is not None:
+            self._loss_value = self._loss_tensor.item()
+        return self._loss_value
+
+    @loss.setter
+    def loss(self, value: Optional[float]):
+        self._loss_tensor = None
+        self._loss_value = value
+
+    def step(self, record_best: bool = False, sync_loss: bool = True):
         """
         Perform exactly one gradient-descent update step.
 
         Args:
             record_best (bool, optional): Whether to record the best discrete solution. Defaults to False.
+            sync_loss (bool, optional): Return the loss as a Python float. When False the detached
+                zero-dim loss tensor is returned instead, so the step does not wait on the device;
+                read ``self.loss`` when the value is actually needed. Defaults to True.
 
         Returns:
-            float: The loss value of the current step.
+            float | torch.Tensor: The loss value of the current step.
         """
         if self.pixel_height_logits.grad is not None:
             self.pixel_height_logits.grad = None
@@ -306,26 +352,36 @@ class FilamentOptimizer:
             g["lr"] = self.current_learning_rate
 
         tau_height, tau_global = self._get_tau()
+        if self._tau_buf is not None:
+            # In-place fills keep the graph inputs at fixed addresses.
+            self._tau_buf[0].fill_(tau_height)
+            self._tau_buf[1].fill_(tau_global)
+            tau_height, tau_global = self._tau_buf[0], self._tau_buf[1]
+        if self._cuda_graphs:
+            torch.compiler.cudagraph_mark_step_begin()
+
+        # Parameters stay float32; only the compositing/loss forward runs in the
+        # autocast dtype picked by the precision manager.
+        with self.precision.autocast():
+            effective_logits = self._apply_height_offset()
 
-        effective_logits = self._apply_height_offset()
-
-        loss = loss_fn(
-            {
-                "pixel_height_logits": effective_logits,
-                "global_logits": self.params["global_logits"],
-            },
-            target=self.target,
-            tau_height=tau_height,
-            tau_global=tau_global,
-            h=self.h,
-            max_layers=self.max_layers,
-            material_colors=self.material_colors,
-            material_TDs=self.material_TDs,
-            background=self.background,
-            add_penalty_loss=10.0,
-            focus_map=self.focus_map,
-            focus_strength=10.0,
-        )
+            loss = self._loss_fn(
+                {
+                    "pixel_height_logits": effective_logits,
+                    "global_logits": self.params["global_logits"],
+                },
+                target=self.target,
+                tau_height=tau_height,
+                tau_global=tau_global,
+                h=self.h,
+                max_layers=self.max_layers,
+                material_colors=self.material_colors,
+                material_TDs=self.material_TDs,
+                background=self.background,
+                add_penalty_loss=10.0,
+                focus_map=self.focus_map,
+                focus_strength=10.0,
+            )
 
         self.precision.backward_and_step(loss, self.optimizer)
 
@@ -335,10 +391,13 @@ class FilamentOptimizer:
         if record_best:
             self._maybe_update_best_discrete()
         # torch.cuda.empty_cache()
-        loss = loss.item()
-        self.loss = loss
+        self._loss_tensor = loss.detach()
+        if self._cuda_graphs:
+            # Graph outputs live in a pool the next replay overwrites.
+            self._loss_tensor = self._loss_tensor.clone()
+        self._loss_value = None
 
-        return loss
+        return self.loss if sync_loss else self._loss_tensor
 
     def discretize_solution(
         self,
@@ -374,14 +433,9 @@ class FilamentOptimizer:
         discrete_height_image = torch.round(pixel_heights / h).to(torch.int32)
         discrete_height_image = torch.clamp(discrete_height_image, 0, max_layers)
 
-        num_layers = global_logits.shape[0]
-        discrete_global_vals = []
-        for j in range(num_layers):
-            p = deterministic_gumbel_softmax(
-                global_logits[j], tau_global, hard=True, rng_seed=rng_seed + j
-            )
-            discrete_global_vals.append(torch.argmax(p))
-        discrete_global = torch.stack(discrete_global_vals, dim=0)
+        discrete_global = deterministic_gumbel_argmax(
+            global_logits, tau_global, rng_seed
+        )
         return discrete_global, discrete_height_image
 
     def log_to_tensorboard(
@@ -468,8 +522,7 @@ class FilamentOptimizer:
                 self.material_TDs,
                 self.background,
             )
-            comp_np = np.clip(comp.cpu().detach().numpy(), 0, 255).astype(np.uint8)
-            self.current_comp_ax.set_data(comp_np)
+            self.current_comp_ax.set_data(self._preview_u8("current", comp))
 
             # Priority mask does not change over time; no update needed unless future edits require it.
 
@@ -491,10 +544,7 @@ class FilamentOptimizer:
                     self.background,
                     rng_seed=self.best_seed,
                 )
-                best_comp_np = np.clip(best_comp.cpu().detach().numpy(), 0, 255).astype(
-                    np.uint8
-                )
-                self.best_comp_ax.set_data(best_comp_np)
+                self.best_comp_ax.set_data(self._preview_u8("best", best_comp))
 
             # Update the depth map correctly.
             effective_logits = self._apply_height_offset()
@@ -531,7 +581,45 @@ class FilamentOptimizer:
             )
             if self.args.disable_visualization_for_gradio != 1:
                 plt.pause(0.01)
-            plt.savefig(self.args.output_folder + "/vis_temp.png")
+            # Rasterise here (matplotlib is not thread-safe) but leave the PNG
+            # encoding and file write to the background writer.
+            self.fig.canvas.draw()
+            rgba = np.asarray(self.fig.canvas.buffer_rgba())
+            self._vis_writer.submit(
+                self.args.output_folder + "/vis_temp.png",
+                np.ascontiguousarray(rgba[..., 2::-1]),
+            )
+
+    def _preview_u8(self, key: str, comp: torch.Tensor) -> np.ndarray:
+        """
+        Clamp and cast a composite to uint8 on its device, then copy it into a
+        host buffer that is reused across calls (pinned on CUDA).
+
+        The returned array is overwritten by the next call with the same key.
+        """
+        bufs = self._preview_bufs.get(key)
+        if bufs is None or bufs[0].shape != comp.shape:
+            dev_buf = torch.empty(comp.shape, dtype=torch.uint8, device=comp.device)
+            host_buf = (
+                dev_buf
+                if comp.device.type == "cpu"
+                else torch.empty(
+                    comp.shape,
+                    dtype=torch.uint8,
+                    pin_memory=comp.device.type == "cuda",
+                )
+            )
+            bufs = self._preview_bufs[key] = (dev_buf, host_buf)
+        dev_buf, host_buf = bufs
+        dev_buf.copy_(comp.clamp(0, 255))
+        if host_buf is not dev_buf:
+            host_buf.copy_(dev_buf)
+        return host_buf.numpy()
+
+    def close_visualization(self):
+        """Write the last pending preview frame and stop the writer thread."""
+        if self.visualize_flag:
+            self._vis_writer.close()
 
     def get_current_parameters(self):
         """
@@ -621,6 +709,32 @@ class FilamentOptimizer:
             )
         return best_comp
 
+    def get_best_discretized_images(self, layer_materials: torch.Tensor):
+        """
+        Composite several discrete material assignments on the best height map at once.
+
+        Args:
+            layer_materials (torch.Tensor): [B, max_layers] material index per layer.
+
+        Returns:
+            torch.Tensor: Discrete composites, shape [B, H, W, 3].
+        """
+        with torch.no_grad():
+            effective_logits = self._apply_height_offset(
+                self.best_params["pixel_height_logits"],
+                self.best_params["height_offsets"],
+            )
+            return composite_image_disc_layers(
+                effective_logits,
+                layer_materials.to(device=self.device, dtype=torch.int64),
+                self.vis_tau,
+                self.h,
+                self.max_layers,
+                self.material_colors,
+                self.material_TDs,
+                self.background,
+            )
+
     def prune(
         self,
         max_colors_allowed: int,
@@ -643,11 +757,7 @@ class FilamentOptimizer:
             self.rng_seed_search(self.best_discrete_loss, 100, autoset_seed=True)
 
         # clear pytorch and system cache to reduce vram usage
-        torch.cuda.empty_cache()
-        import gc
-
-        gc.collect()
-        torch.cuda.empty_cache()
+        free_device_memory()
 
         prune_num_colors(
             self,
@@ -690,7 +800,7 @@ class FilamentOptimizer:
 
             # 1) Discretize
             tau_g = self.vis_tau
-            with torch.no_grad():
+            with torch.no_grad(), self.precision.autocast():
                 effective_logits = self._apply_height_offset()
                 disc_global, disc_height_image = self.discretize_solution(
                     self.params, tau_g, self.h, self.max_layers, rng_seed=seed
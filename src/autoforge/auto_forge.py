@@ -17,25 +17,41 @@ behavior should have changed relative to the previous monolithic version.
 """
 
 import argparse
+import signal
 import sys
 import os
+import threading
 import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 from typing import Optional, Tuple, List
 
+# Let ops without an MPS kernel fall back to the CPU instead of raising.
+# Must be set before torch is imported.
+os.environ.setdefault("PYTORCH_ENABLE_MPS_FALLBACK", "1")
+
 import configargparse
 import cv2
 import torch
+import torch.nn.functional as F
 import numpy as np
 from tqdm import tqdm
 
 from autoforge.Helper import PruningHelper
+from autoforge.Helper.AmpUtils import safe_autocast
 from autoforge.Helper.FilamentHelper import hex_to_rgb, load_materials
 from autoforge.Helper.Heightmaps.ChristofidesHeightMap import (
     run_init_threads,
 )
 
 from autoforge.Helper.ImageHelper import resize_image, imread
-from autoforge.Helper.OtherHelper import set_seed, perform_basic_check, get_device
+from autoforge.Helper.OtherHelper import (
+    set_seed,
+    perform_basic_check,
+    get_device,
+    to_device,
+    free_device_memory,
+)
 from autoforge.Helper.OutputHelper import (
     generate_stl,
     generate_swap_instructions,
@@ -236,10 +252,30 @@ def parse_args() -> argparse.Namespace:
         help="Specify the random seed, or use 0 for automatic generation",
     )
 
+    parser.add_argument(
+        "--device",
+        type=str,
+        choices=["auto", "cuda", "mps", "cpu"],
+        default="auto",
+        help="Device to run on. 'auto' picks CUDA, then Apple MPS, then CPU.",
+    )
+
     parser.add_argument(
         "--mps",
         action="store_true",
-        help="Use the Metal Performance Shaders (MPS) backend, if available.",
+        help="Use the Metal Performance Shaders (MPS) backend, if available. Same as --device mps.",
+    )
+
+    parser.add_argument(
+        "--compile",
+        action="store_true",
+        help="Compile the optimization forward pass with torch.compile (CUDA only). The first iterations are slower while kernels are generated.",
+    )
+
+    parser.add_argument(
+        "--cuda_graphs",
+        action="store_true",
+        help="Like --compile, but also replay the compiled forward/backward as a CUDA graph to cut per-iteration launch overhead (CUDA only).",
     )
 
     parser.add_argument(
@@ -257,6 +293,13 @@ def parse_args() -> argparse.Namespace:
         help="Number of rounds to choose the starting height map from.",
     )
 
+    parser.add_argument(
+        "--num_init_threads",
+        type=int,
+        default=-1,
+        help="Number of worker processes for the height map initialization rounds (-1 = one per physical CPU core).",
+    )
+
     parser.add_argument(
         "--num_init_cluster_layers",
         type=int,
@@ -459,11 +502,9 @@ def _prepare_background_and_materials(
         (bgr_tuple_uint8, background_tensor, material_colors_tensor, material_TDs_tensor)
     """
     bgr_tuple = tuple(hex_to_rgb(args.background_color))
-    background = torch.tensor(bgr_tuple, dtype=torch.float32, device=device)
-    material_colors = torch.tensor(
-        material_colors_np, dtype=torch.float32, device=device
-    )
-    material_TDs = torch.tensor(material_TDs_np, dtype=torch.float32, device=device)
+    background = to_device(bgr_tuple, device)
+    material_colors = to_device(material_colors_np, device)
+    material_TDs = to_device(material_TDs_np, device)
     return bgr_tuple, background, material_colors, material_TDs
 
 
@@ -509,7 +550,7 @@ def _load_priority_mask(
         tgt_h, tgt_w = output_img_np.shape[:2]
         pm_resized = cv2.resize(pm, (tgt_w, tgt_h), interpolation=cv2.INTER_LINEAR)
         pm_float = pm_resized.astype(np.float32) / 255.0
-        focus_map_full = torch.tensor(pm_float, dtype=torch.float32, device=device)
+        focus_map_full = to_device(pm_float, device)
         cv2.imwrite(
             os.path.join(args.output_folder, "priority_mask_resized.png"),
             (pm_float * 255).astype(np.uint8),
@@ -564,7 +605,7 @@ def _initialize_heightmap(
                 args.layer_height,
                 bgr_tuple,
                 random_seed=random_seed,
-                num_threads=4,
+                num_threads=args.num_init_threads,
                 init_method="kmeans",
                 cluster_layers=args.num_init_cluster_layers,
                 material_colors=material_colors_np,
@@ -595,18 +636,18 @@ def _prepare_processing_targets(
         focus_map_proc     : Optional downscaled focus map tensor (H_p,W_p).
     """
     processing_img_np = resize_image(output_img_np, computed_processing_size)
-    processing_target = torch.tensor(
-        processing_img_np, dtype=torch.float32, device=device
-    )
+    processing_target = to_device(processing_img_np, device)
 
     focus_map_proc = None
     if focus_map_full is not None:
-        fm_proc_np = cv2.resize(
-            focus_map_full.cpu().numpy().astype(np.float32),
-            (processing_target.shape[1], processing_target.shape[0]),
-            interpolation=cv2.INTER_LINEAR,
-        )
-        focus_map_proc = torch.tensor(fm_proc_np, dtype=torch.float32, device=device)
+        # Resize on the device (half-pixel bilinear, like cv2.INTER_LINEAR)
+        # instead of copying the full-resolution map back to the host.
+        focus_map_proc = F.interpolate(
+            focus_map_full[None, None],
+            size=(processing_target.shape[0], processing_target.shape[1]),
+            mode="bilinear",
+            align_corners=False,
+        )[0, 0]
 
     return processing_img_np, processing_target, focus_map_proc
 
@@ -647,16 +688,92 @@ def _build_optimizer(
     return optimizer
 
 
+class _ProgressReporter:
+    """Refresh the progress bar description from a background thread.
+
+    The optimization loop only publishes its latest state in ``latest``
+    (iteration, loss tensor, best discrete loss, learning rate); the loss is
+    read back from the device here, at most once per ``interval`` seconds.
+    """
+
+    def __init__(self, tbar: tqdm, interval: float = 0.5):
+        self.tbar = tbar
+        self.interval = interval
+        self.latest = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        # Show the final state rather than the last periodic refresh.
+        self._refresh()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._refresh()
+
+    def _refresh(self) -> None:
+        latest = self.latest
+        if latest is None:
+            return
+        iteration, loss, best_loss, learning_rate = latest
+        self.tbar.set_description(
+            f"Iteration {iteration}, Loss = {float(loss):.4f}, best validation Loss = {best_loss:.4f}, learning_rate= {learning_rate:.6f}"
+        )
+
+
+@contextmanager
+def _stop_on_interrupt():
+    """Turn the first Ctrl+C into a stop request for the optimization loop.
+
+    Yields a threading.Event that the loop polls every iteration, so the run
+    goes on to prune and export the best solution found so far. A second
+    Ctrl+C raises KeyboardInterrupt as usual. Signal handlers can only be
+    installed from the main thread; elsewhere the event is never set.
+    """
+    stop = threading.Event()
+    if threading.current_thread() is not threading.main_thread():
+        yield stop
+        return
+
+    previous = signal.getsignal(signal.SIGINT)
+    if previous is None:
+        # Handler installed outside Python; it cannot be restored from here.
+        previous = signal.default_int_handler
+
+    def _handler(signum, frame):
+        print(
+            "\nStopping optimization, press Ctrl+C again to abort.",
+            file=sys.stderr,
+        )
+        stop.set()
+        signal.signal(signal.SIGINT, previous)
+
+    signal.signal(signal.SIGINT, _handler)
+    try:
+        yield stop
+    finally:
+        signal.signal(signal.SIGINT, previous)
+
+
 def _run_optimization_loop(
     optimizer: FilamentOptimizer, args, device: torch.device
 ) -> None:
     """Execute the main gradient-based optimization iterations.
 
     Features:
-    - Automatic mixed precision (bfloat16 unless MPS).
+    - Automatic mixed precision inside FilamentOptimizer.step (probed bf16/fp16,
+      fp32 fallback; override with AUTOFORGE_AMP=off|bf16|fp16).
     - Periodic visualization & tensorboard logging (every 100 iterations).
+    - Progress bar refreshed from a background thread every 0.5 s.
     - Discrete solution snapshots controlled via --discrete_check.
     - Early stopping after a patience window (--early_stopping).
+    - Ctrl+C stops the loop and keeps the best solution found so far.
 
     Args:
         optimizer: Configured FilamentOptimizer instance.
@@ -665,28 +782,62 @@ def _run_optimization_loop(
     """
     print("Starting optimization...")
     tbar = tqdm(range(args.iterations))
-    dtype = torch.bfloat16 if not args.mps else torch.float32
-    with torch.autocast(device.type, dtype=dtype):
-        for i in tbar:
-            loss_val = optimizer.step(record_best=i % args.discrete_check == 0)
-
-            optimizer.visualize(interval=100)
-            optimizer.log_to_tensorboard(interval=100)
-
-            if (i + 1) % 100 == 0:
-                tbar.set_description(
-                    f"Iteration {i + 1}, Loss = {loss_val:.4f}, best validation Loss = {optimizer.best_discrete_loss:.4f}, learning_rate= {optimizer.current_learning_rate:.6f}"
+    # The finally also runs when a step raises (e.g. out of memory), so the
+    # preview writer thread is joined on every exit path.
+    try:
+        with _ProgressReporter(tbar) as progress, _stop_on_interrupt() as stop:
+            for i in tbar:
+                # Keep the loss on the device; the reporter thread reads it back.
+                loss = optimizer.step(
+                    record_best=i % args.discrete_check == 0, sync_loss=False
                 )
-            if (
-                optimizer.best_step is not None
-                and optimizer.num_steps_done - optimizer.best_step > args.early_stopping
-            ):
-                print(
-                    "Early stopping after",
-                    args.early_stopping,
-                    "steps without improvement.",
+                progress.latest = (
+                    i + 1,
+                    loss,
+                    optimizer.best_discrete_loss,
+                    optimizer.current_learning_rate,
                 )
-                break
+
+                optimizer.visualize(interval=100)
+                optimizer.log_to_tensorboard(interval=100)
+
+                if (
+                    optimizer.best_step is not None
+                    and optimizer.num_steps_done - optimizer.best_step
+                    > args.early_stopping
+                ):
+                    print(
+                        "Early stopping after",
+                        args.early_stopping,
+                        "steps without improvement.",
+                    )
+                    break
+                if stop.is_set():
+                    break
+    finally:
+        optimizer.close_visualization()
+
+
+def _write_swap_instructions(
+    args,
+    disc_global_np: np.ndarray,
+    disc_height_np: np.ndarray,
+    material_names: List[str],
+) -> None:
+    """Generate the filament swap instructions and write them to the output folder."""
+    background_layers = int(args.background_height // args.layer_height)
+    swap_instructions = generate_swap_instructions(
+        disc_global_np,
+        disc_height_np,
+        args.layer_height,
+        background_layers,
+        args.background_height,
+        material_names,
+        getattr(args, "background_material_name", None),
+    )
+    with open(os.path.join(args.output_folder, "swap_instructions.txt"), "w") as f:
+        for line in swap_instructions:
+            f.write(line + "\n")
 
 
 def _post_optimize_and_export(
@@ -727,15 +878,14 @@ def _post_optimize_and_export(
         pixel_height_logits_init
     ).to(device)
     optimizer.target = output_target
-    optimizer.pixel_height_labels = torch.tensor(
-        pixel_height_labels, dtype=torch.int32, device=device
+    optimizer.pixel_height_labels = to_device(
+        pixel_height_labels, device, dtype=torch.int32
     )
     if focus_map_proc is not None and focus_map_full is not None:
         optimizer.focus_map = focus_map_full
 
-    dtype = torch.bfloat16 if not args.mps else torch.float32
     with torch.no_grad():
-        with torch.autocast(device.type, dtype=dtype):
+        with safe_autocast(device):
             if args.perform_pruning:
                 # Adjust pruning_max_colors to account for background and clear filament
                 # pruning_max_colors = total filaments needed
@@ -769,89 +919,98 @@ def _post_optimize_and_export(
             disc_global, disc_height_image = optimizer.get_discretized_solution(
                 best=True
             )
+            # Host copies used by every exporter below; fetch them only once.
+            disc_global_np = disc_global.cpu().numpy()
+            disc_height_np = disc_height_image.cpu().numpy()
 
-            final_loss = PruningHelper.get_initial_loss(
-                optimizer.best_params["global_logits"].shape[0], optimizer
-            )
-            with open(os.path.join(args.output_folder, "final_loss.txt"), "w") as f:
-                f.write(f"{final_loss}")
-
-            print("Done. Saving outputs...")
-            comp_disc = optimizer.get_best_discretized_image()
+            # The exporters only need the discrete solution, so run them side by
+            # side and let them overlap with the final loss and preview rendering.
             args.max_layers = optimizer.max_layers
+            exports = {}
+            with ThreadPoolExecutor(max_workers=4) as export_pool:
+                if args.flatforge:
+                    # FlatForge mode: Generate separate STL files for each color
+                    print("FlatForge mode enabled. Generating separate STL files...")
+                    stl_future = export_pool.submit(
+                        generate_flatforge_stls,
+                        disc_global_np,
+                        disc_height_np,
+                        material_colors_np,
+                        material_names,
+                        material_TDs_np,
+                        args.layer_height,
+                        args.background_height,
+                        args.background_color,
+                        args.stl_output_size,
+                        args.output_folder,
+                        cap_layers=args.cap_layers,
+                        alpha_mask=alpha,
+                    )
+                    exports[stl_future] = "FlatForge STL files"
+                else:
+                    # Traditional mode: Generate single STL file
+                    stl_filename = os.path.join(args.output_folder, "final_model.stl")
+                    height_map_mm = disc_height_np.astype(np.float32)
+                    height_map_mm *= args.layer_height
+                    stl_future = export_pool.submit(
+                        generate_stl,
+                        height_map_mm,
+                        stl_filename,
+                        args.background_height,
+                        maximum_x_y_size=args.stl_output_size,
+                        alpha_mask=alpha,
+                    )
+                    exports[stl_future] = "final_model.stl"
+
+                    swap_future = export_pool.submit(
+                        _write_swap_instructions,
+                        args,
+                        disc_global_np,
+                        disc_height_np,
+                        material_names,
+                    )
+                    exports[swap_future] = "swap_instructions.txt"
+
+                    project_future = export_pool.submit(
+                        generate_project_file,
+                        os.path.join(args.output_folder, "project_file.hfp"),
+                        args,
+                        disc_global_np,
+                        disc_height_np,
+                        output_target.shape[1],
+                        output_target.shape[0],
+                        stl_filename,
+                        args.csv_file,
+                    )
+                    exports[project_future] = "project_file.hfp"
+
+                final_loss = PruningHelper.get_initial_loss(
+                    optimizer.best_params["global_logits"].shape[0], optimizer
+                )
+                with open(os.path.join(args.output_folder, "final_loss.txt"), "w") as f:
+                    f.write(f"{final_loss}")
 
-            optimizer.log_to_tensorboard(
-                interval=1,
-                namespace="post_opt",
-                step=(post_opt_step := post_opt_step + 1),
-            )
-
-            comp_disc_np = comp_disc.cpu().numpy().astype(np.uint8)
-            comp_disc_np = cv2.cvtColor(comp_disc_np, cv2.COLOR_RGB2BGR)
-            cv2.imwrite(
-                os.path.join(args.output_folder, "final_model.png"), comp_disc_np
-            )
+                print("Done. Saving outputs...")
+                comp_disc = optimizer.get_best_discretized_image()
 
-            # Generate STL files
-            if args.flatforge:
-                # FlatForge mode: Generate separate STL files for each color
-                print("FlatForge mode enabled. Generating separate STL files...")
-                generate_flatforge_stls(
-                    disc_global.cpu().numpy(),
-                    disc_height_image.cpu().numpy(),
-                    material_colors_np,
-                    material_names,
-                    material_TDs_np,
-                    args.layer_height,
-                    args.background_height,
-                    args.background_color,
-                    args.stl_output_size,
-                    args.output_folder,
-                    cap_layers=args.cap_layers,
-                    alpha_mask=alpha,
-                )
-            else:
-                # Traditional mode: Generate single STL file
-                stl_filename = os.path.join(args.output_folder, "final_model.stl")
-                height_map_mm = (
-                    disc_height_image.cpu().numpy().astype(np.float32)
-                ) * args.layer_height
-                generate_stl(
-                    height_map_mm,
-                    stl_filename,
-                    args.background_height,
-                    maximum_x_y_size=args.stl_output_size,
-                    alpha_mask=alpha,
+                optimizer.log_to_tensorboard(
+                    interval=1,
+                    namespace="post_opt",
+                    step=(post_opt_step := post_opt_step + 1),
                 )
 
-            if not args.flatforge:
-                background_layers = int(args.background_height // args.layer_height)
-                swap_instructions = generate_swap_instructions(
-                    disc_global.cpu().numpy(),
-                    disc_height_image.cpu().numpy(),
-                    args.layer_height,
-                    background_layers,
-                    args.background_height,
-                    material_names,
-                    getattr(args, "background_material_name", None),
-                )
-                with open(
-                    os.path.join(args.output_folder, "swap_instructions.txt"), "w"
-                ) as f:
-                    for line in swap_instructions:
-                        f.write(line + "\n")
-
-                project_filename = os.path.join(args.output_folder, "project_file.hfp")
-                generate_project_file(
-                    project_filename,
-                    args,
-                    disc_global.cpu().numpy(),
-                    disc_height_image.cpu().numpy(),
-                    output_target.shape[1],
-                    output_target.shape[0],
-                    os.path.join(args.output_folder, "final_model.stl"),
-                    args.csv_file,
+                comp_disc_np = comp_disc.cpu().numpy().astype(np.uint8)
+                comp_disc_np = cv2.cvtColor(comp_disc_np, cv2.COLOR_RGB2BGR)
+                png_future = export_pool.submit(
+                    cv2.imwrite,
+                    os.path.join(args.output_folder, "final_model.png"),
+                    comp_disc_np,
                 )
+                exports[png_future] = "final_model.png"
+
+                for future in as_completed(exports):
+                    future.result()
+                    print(f"Saved {exports[future]}")
 
             print("All done. Outputs in:", args.output_folder)
             print("Happy Printing!")
@@ -928,7 +1087,7 @@ def start(args) -> float:
 
     # For the final resolution
     output_img_np = resize_image(img_rgb, computed_output_size)
-    output_target = torch.tensor(output_img_np, dtype=torch.float32, device=device)
+    output_target = to_device(output_img_np, device)
 
     # Priority mask handling (full-res)
     focus_map_full = _load_priority_mask(args, output_img_np, device)
@@ -985,26 +1144,63 @@ def start(args) -> float:
     # Run optimization loop
     _run_optimization_loop(optimizer, args, device)
 
-    # Post-process, prune, and export outputs
-    final_loss = _post_optimize_and_export(
-        args,
-        optimizer,
-        pixel_height_logits_init,
-        pixel_height_labels,
-        output_target,
-        alpha,
-        material_colors_np,
-        material_TDs_np,
-        material_names,
-        bgr_tuple,
-        device,
-        focus_map_full,
-        focus_map_proc,
-    )
+    # Post-process, prune, and export outputs. These run at the full output
+    # resolution, which a larger processing_reduction_factor does not shrink.
+    try:
+        final_loss = _post_optimize_and_export(
+            args,
+            optimizer,
+            pixel_height_logits_init,
+            pixel_height_labels,
+            output_target,
+            alpha,
+            material_colors_np,
+            material_TDs_np,
+            material_names,
+            bgr_tuple,
+            device,
+            focus_map_full,
+            focus_map_proc,
+        )
+    except torch.OutOfMemoryError as e:
+        raise _OutputResolutionOutOfMemoryError(str(e)) from e
 
     return final_loss
 
 
+class _OutputResolutionOutOfMemoryError(torch.OutOfMemoryError):
+    """Out of memory while pruning or exporting at the full output resolution."""
+
+
+def _start_with_oom_fallback(args, max_retries: int = 2) -> float:
+    """Run start(), retrying at half the processing resolution on out-of-memory.
+
+    Every attempt works on its own copy of ``args`` because start() updates
+    some of them (e.g. max_layers after pruning), so the caller's args (and
+    later --best_of runs) keep the requested resolution. Only out-of-memory
+    errors up to the end of the optimization loop are retried; pruning and
+    export run at the output resolution, which a retry would not reduce.
+    """
+    reduction_factor = args.processing_reduction_factor
+    for attempt in range(max_retries + 1):
+        run_args = argparse.Namespace(**vars(args))
+        run_args.processing_reduction_factor = reduction_factor
+        try:
+            return start(run_args)
+        except torch.OutOfMemoryError as e:
+            if attempt == max_retries or isinstance(
+                e, _OutputResolutionOutOfMemoryError
+            ):
+                raise
+        # Outside the handler, so the traceback no longer pins the failed run's tensors.
+        free_device_memory()
+        reduction_factor *= 2
+        print(
+            f"Out of device memory, retrying with --processing_reduction_factor {reduction_factor}",
+            file=sys.stderr,
+        )
+
+
 def main() -> None:
     """Support multi-run execution via --best_of; persist best run artifacts.
 
@@ -1013,13 +1209,13 @@ def main() -> None:
     - Tracks losses, reports statistics (best / median / std).
     - Moves files from best run folder into the final output folder.
 
-    Note: Memory is periodically reclaimed (gc + CUDA cache clears + closing matplotlib figures).
+    Note: Memory is reclaimed after every run (gc + CUDA/MPS cache clears + closing matplotlib figures).
     """
     args = parse_args()
     final_output_folder = args.output_folder
     run_best_loss = 1000000000
     if args.best_of == 1:
-        start(args)
+        _start_with_oom_fallback(args)
     else:
         temp_output_folder = os.path.join(args.output_folder, "temp")
         ret = []
@@ -1029,22 +1225,20 @@ def main() -> None:
                 run_folder = os.path.join(temp_output_folder, f"run_{i + 1}")
                 args.output_folder = run_folder
                 os.makedirs(args.output_folder, exist_ok=True)
-                run_loss = start(args)
+                run_loss = _start_with_oom_fallback(args)
                 print(f"Run {i + 1} finished with loss: {run_loss}")
                 if run_loss < run_best_loss:
                     run_best_loss = run_loss
                     print(f"New best loss found: {run_best_loss} in run {i + 1}")
                 ret.append((run_folder, run_loss))
-                torch.cuda.empty_cache()
-                import gc
-
-                gc.collect()
-                torch.cuda.empty_cache()
+            except Exception:
+                traceback.print_exc()
+            finally:
+                # Release this run's tensors and figures, also when it failed.
                 import matplotlib.pyplot as plt
 
                 plt.close("all")
-            except Exception:
-                traceback.print_exc()
+                free_device_memory()
         best_run = min(ret, key=lambda x: x[1])
         best_run_folder = best_run[0]
         best_loss = best_run[1]
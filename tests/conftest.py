@@ -44,6 +44,8 @@ def mock_depth_pipeline(monkeypatch):
     try:
         import autoforge.Helper.Heightmaps.DepthEstimateHeightMap as dehm
 
+        # Drop pipelines cached by earlier tests so the dummy is picked up
+        monkeypatch.setattr(dehm, "_depth_pipelines", {})
         monkeypatch.setattr(dehm, "pipeline", dummy_pipeline, raising=True)
     except Exception:
         pass
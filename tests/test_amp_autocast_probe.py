@@ -50,3 +50,20 @@ def test_env_override_modes(monkeypatch, force):
     loss.backward()
     assert w.grad is not None
 
+
+def test_precision_manager_matches_selected_dtype():
+    from autoforge.Helper.OptimizerHelper import PrecisionManager
+
+    device = _device_from_env()
+    dtype, _reason = get_selected_autocast(device)
+    prec = PrecisionManager(device)
+    assert prec.autocast_dtype == dtype
+    assert prec.enabled == (dtype is not None)
+
+    w = torch.randn(8, 8, device=device, dtype=torch.float32, requires_grad=True)
+    opt = torch.optim.SGD([w], lr=1e-3)
+    with prec.autocast():
+        loss = (w @ w).float().pow(2).mean()
+    prec.backward_and_step(loss, opt)
+    # master weights stay in float32 regardless of the autocast dtype
+    assert w.dtype == torch.float32
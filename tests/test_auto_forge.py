@@ -0,0 +1,154 @@
+import argparse
+import os
+
+import pytest
+import torch
+
+import autoforge.auto_forge as af
+
+
+def _oom_args(**overrides):
+    ns = argparse.Namespace(processing_reduction_factor=2, max_layers=75)
+    vars(ns).update(overrides)
+    return ns
+
+
+def test_oom_fallback_retries_on_copies_with_halved_resolution(monkeypatch):
+    factors = []
+
+    def fake_start(run_args):
+        factors.append(run_args.processing_reduction_factor)
+        run_args.max_layers = 10
+        if len(factors) < 3:
+            raise torch.OutOfMemoryError("out of memory")
+        return 0.5
+
+    monkeypatch.setattr(af, "start", fake_start)
+    monkeypatch.setattr(af, "free_device_memory", lambda: None)
+    args = _oom_args()
+
+    assert af._start_with_oom_fallback(args, max_retries=2) == 0.5
+    assert factors == [2, 4, 8]
+    assert vars(args) == vars(_oom_args())
+
+
+def test_oom_fallback_gives_up_after_max_retries(monkeypatch):
+    factors = []
+
+    def fake_start(run_args):
+        factors.append(run_args.processing_reduction_factor)
+        raise torch.OutOfMemoryError("out of memory")
+
+    monkeypatch.setattr(af, "start", fake_start)
+    monkeypatch.setattr(af, "free_device_memory", lambda: None)
+    args = _oom_args()
+
+    with pytest.raises(torch.OutOfMemoryError):
+        af._start_with_oom_fallback(args, max_retries=1)
+    assert factors == [2, 4]
+    assert args.processing_reduction_factor == 2
+
+
+def test_oom_fallback_does_not_retry_output_resolution_oom(monkeypatch):
+    calls = []
+
+    def fake_start(run_args):
+        calls.append(run_args.processing_reduction_factor)
+        raise af._OutputResolutionOutOfMemoryError("out of memory")
+
+    monkeypatch.setattr(af, "start", fake_start)
+    monkeypatch.setattr(af, "free_device_memory", lambda: None)
+
+    with pytest.raises(torch.OutOfMemoryError):
+        af._start_with_oom_fallback(_oom_args())
+    assert calls == [2]
+
+
+def test_main_best_of_cleans_up_after_every_run(monkeypatch, tmp_path):
+    import matplotlib.pyplot as plt
+
+    args = argparse.Namespace(
+        best_of=3, output_folder=str(tmp_path), processing_reduction_factor=2
+    )
+    monkeypatch.setattr(af, "parse_args", lambda: args)
+    runs = []
+
+    def fake_start(run_args):
+        runs.append(run_args.processing_reduction_factor)
+        if len(runs) == 1:
+            raise torch.OutOfMemoryError("out of memory")
+        if len(runs) == 2:
+            raise ValueError("run failed")
+        with open(os.path.join(run_args.output_folder, "final_loss.txt"), "w") as f:
+            f.write("0.25")
+        return 0.25
+
+    cleanups = []
+    monkeypatch.setattr(af, "start", fake_start)
+    monkeypatch.setattr(af, "free_device_memory", lambda: cleanups.append(1))
+    plt.figure()
+
+    af.main()
+
+    # Run 1 retried once at half resolution and then failed; the next runs
+    # start from the requested resolution again.
+    assert runs == [2, 4, 2, 2]
+    # One cleanup before the OOM retry, one after each of the three runs.
+    assert len(cleanups) == 4
+    assert plt.get_fignums() == []
+    assert (tmp_path / "final_loss.txt").read_text() == "0.25"
+
+
+def test_progress_reporter_shows_final_state_on_exit():
+    from tqdm import tqdm
+
+    with tqdm(total=3, disable=False) as tbar:
+        # A long interval means only the refresh on exit can draw this state.
+        with af._ProgressReporter(tbar, interval=60.0) as progress:
+            progress.latest = (3, torch.tensor(0.125), 0.5, 0.01)
+        assert tbar.desc.startswith("Iteration 3, Loss = 0.1250")
+
+
+def test_stop_on_interrupt_sets_event_and_restores_handler():
+    import signal
+
+    original = signal.getsignal(signal.SIGINT)
+    seen = []
+
+    def outer_handler(signum, frame):
+        seen.append(signum)
+
+    signal.signal(signal.SIGINT, outer_handler)
+    try:
+        with af._stop_on_interrupt() as stop:
+            assert not stop.is_set()
+            signal.raise_signal(signal.SIGINT)
+            assert stop.is_set()
+            # The first Ctrl+C hands SIGINT back to the previous handler.
+            assert signal.getsignal(signal.SIGINT) is outer_handler
+            signal.raise_signal(signal.SIGINT)
+        assert seen == [signal.SIGINT]
+        assert signal.getsignal(signal.SIGINT) is outer_handler
+
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        with af._stop_on_interrupt():
+            pass
+        assert signal.getsignal(signal.SIGINT) == signal.SIG_DFL
+    finally:
+        signal.signal(signal.SIGINT, original)
+
+
+def test_optimization_loop_closes_visualization_when_a_step_raises():
+    closed = []
+
+    class FailingOptimizer:
+        def step(self, **kwargs):
+            raise torch.OutOfMemoryError("out of memory")
+
+        def close_visualization(self):
+            closed.append(True)
+
+    args = argparse.Namespace(iterations=3, discrete_check=1, early_stopping=10)
+    with pytest.raises(torch.OutOfMemoryError):
+        af._run_optimization_loop(FailingOptimizer(), args, torch.device("cpu"))
+    assert closed == [True]
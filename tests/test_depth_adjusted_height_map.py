@@ -3,6 +3,7 @@ import pytest
 import sys
 import types
 
+import autoforge.Helper.Heightmaps.DepthEstimateHeightMap as dehm
 from autoforge.Helper.Heightmaps.DepthEstimateHeightMap import (
     init_height_map_depth_color_adjusted,
     choose_optimal_num_bands,
@@ -37,6 +38,25 @@ def _install_fake_transformers(monkeypatch, depth_map: np.ndarray):
     fake_mod.pipeline = dummy_pipeline
     # ensure subattributes potentially accessed exist (not used here but safe)
     monkeypatch.setitem(sys.modules, "transformers", fake_mod)
+    monkeypatch.setattr(dehm, "_depth_pipelines", {})
+
+
+def test_depth_pipeline_is_built_once_per_model(monkeypatch):
+    calls = []
+    fake_mod = types.ModuleType("transformers")
+
+    def counting_pipeline(*, task, model):
+        calls.append(model)
+        return DummyDepthPipe(np.zeros((4, 4), dtype=np.float32))
+
+    fake_mod.pipeline = counting_pipeline
+    monkeypatch.setitem(sys.modules, "transformers", fake_mod)
+    monkeypatch.setattr(dehm, "_depth_pipelines", {})
+
+    first = dehm.get_depth_pipeline()
+    assert dehm.get_depth_pipeline() is first
+    assert dehm.get_depth_pipeline("other/model") is not first
+    assert len(calls) == 2
 
 
 def test_init_height_map_no_split(monkeypatch, two_color_image):
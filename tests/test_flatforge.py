@@ -260,3 +260,41 @@ def test_flatforge_empty_height_map(tmp_path):
     
     # Should return empty or minimal files
     assert isinstance(stl_files, list), "Should return a list"
+
+
+def test_flatforge_gap_layers_extend_color_from_below(tmp_path):
+    """A -1 gap in disc_global is printed with the color of the layer below it."""
+    import trimesh
+
+    H, W = 6, 6
+    disc_height_image = np.full((H, W), 4, dtype=int)
+    disc_height_image[:, :3] = 2  # left half stops below the gap
+    disc_global = np.array([0, 1, -1, 0])
+
+    stl_files = generate_flatforge_stls(
+        disc_global=disc_global,
+        disc_height_image=disc_height_image,
+        material_colors_np=np.array([[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]]),
+        material_names=["Red", "Green"],
+        material_TDs_np=np.array([5.0, 25.0]),
+        layer_height=0.1,
+        background_height=0.5,
+        background_color_hex="#000000",
+        maximum_x_y_size=10.0,
+        output_folder=str(tmp_path),
+        cap_layers=0,
+        alpha_mask=None,
+    )
+
+    green = [f for f in stl_files if os.path.basename(f).startswith("Green")]
+    assert len(green) == 1
+    z_min, z_max = trimesh.load(green[0]).bounds[:, 2]
+    # Green covers layer 1 and the gap at layer 2 above it
+    assert z_min == pytest.approx(0.5 + 0.1)
+    assert z_max == pytest.approx(0.5 + 0.3)
+
+    clear = [f for f in stl_files if os.path.basename(f).startswith("Clear_")]
+    assert len(clear) == 1
+    z_min, z_max = trimesh.load(clear[0]).bounds[:, 2]
+    assert z_min == pytest.approx(0.5 + 0.2)
+    assert z_max == pytest.approx(0.5 + 0.4)
@@ -5,6 +5,8 @@ np = pytest.importorskip("numpy")
 cv2 = pytest.importorskip("cv2")
 
 from autoforge.Helper.ImageHelper import (
+    AsyncImageWriter,
+    imread,
     increase_saturation,
     srgb_to_lab,
     resize_image_exact,
@@ -40,3 +42,15 @@ def test_resize_image_exact():
     arr = (np.random.rand(20, 30, 3) * 255).astype(np.uint8)
     out = resize_image_exact(arr, 10, 15)
     assert out.shape == (15, 10, 3)
+
+
+def test_async_image_writer_writes_latest_frame(tmp_path):
+    path = str(tmp_path / "preview.png")
+    writer = AsyncImageWriter()
+    for v in range(0, 250, 50):
+        writer.submit(path, np.full((4, 5, 3), v, dtype=np.uint8))
+    writer.close()
+    out = imread(path)
+    assert out.shape == (4, 5, 3)
+    assert (out == 200).all()
+    assert not (tmp_path / "preview.png.tmp").exists()
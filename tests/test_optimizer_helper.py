@@ -3,9 +3,11 @@ from autoforge.Helper.OptimizerHelper import (
     adaptive_round,
     deterministic_rand_like,
     deterministic_gumbel_softmax,
+    deterministic_gumbel_argmax,
     bleed_layer_effect,
     composite_image_cont,
     composite_image_disc,
+    composite_image_disc_layers,
 )
 
 
@@ -33,6 +35,21 @@ def test_deterministic_gumbel_softmax_repro():
     assert torch.allclose(y1, y2)
 
 
+def test_deterministic_gumbel_argmax_matches_per_row_loop():
+    logits = torch.randn(12, 5, generator=torch.Generator().manual_seed(0)) * 3
+    expected = torch.stack(
+        [
+            torch.argmax(
+                deterministic_gumbel_softmax(logits[j], 0.5, True, 1234 + j)
+            )
+            for j in range(logits.shape[0])
+        ]
+    )
+    out = deterministic_gumbel_argmax(logits, 0.5, 1234)
+    assert out.dtype == torch.int64
+    assert torch.equal(out, expected)
+
+
 def _simple_composite_inputs(H=8, W=8, L=4, M=3):
     pixel_logits = torch.zeros(H, W)
     global_logits = torch.zeros(L, M)
@@ -57,6 +74,25 @@ def test_composite_image_disc_shapes():
     assert out.shape == (pl.shape[0], pl.shape[1], 3)
 
 
+def test_composite_image_disc_layers_batch_matches_single():
+    torch.manual_seed(0)
+    pl, gl, mc, td, bg = _simple_composite_inputs()
+    pl, gl = torch.randn_like(pl) * 3, torch.randn_like(gl)
+    L = gl.shape[0]
+    single = composite_image_disc(pl, gl, 0.5, 0.5, 0.2, L, mc, td, bg, rng_seed=0)
+    mats = deterministic_gumbel_argmax(gl, 0.5, 0)
+    other = torch.roll(mats, 1)
+    batch = composite_image_disc_layers(
+        pl, torch.stack([mats, other]), 0.5, 0.2, L, mc, td, bg
+    )
+    assert batch.shape == (2, pl.shape[0], pl.shape[1], 3)
+    assert torch.equal(batch[0], single)
+    alone = composite_image_disc_layers(
+        pl, other.unsqueeze(0), 0.5, 0.2, L, mc, td, bg
+    )
+    assert torch.equal(batch[1], alone[0])
+
+
 def test_bleed_layer_effect_monotonic():
     mask = torch.zeros(2, 4, 4)
     mask[0, 2, 2] = 1.0
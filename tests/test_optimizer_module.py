@@ -2,6 +2,8 @@ import numpy as np
 import torch
 import argparse
 
+import pytest
+
 from autoforge.Modules.Optimizer import FilamentOptimizer
 
 
@@ -28,7 +30,9 @@ def _args():
     return ns
 
 
-def _make_optimizer():
+def _make_optimizer(**arg_overrides):
+    args = _args()
+    vars(args).update(arg_overrides)
     H = W = 4
     target = torch.zeros(H, W, 3, dtype=torch.float32)
     pixel_height_logits_init = np.zeros((H, W), dtype=np.float32)
@@ -39,7 +43,7 @@ def _make_optimizer():
     background = torch.zeros(3)
     device = torch.device("cpu")
     return FilamentOptimizer(
-        _args(),
+        args,
         target,
         pixel_height_logits_init,
         pixel_height_labels,
@@ -70,6 +74,56 @@ def test_optimizer_step_and_discretize():
     }
 
 
+def test_optimizer_step_without_loss_sync():
+    opt = _make_optimizer()
+    loss = opt.step(record_best=False, sync_loss=False)
+    assert torch.is_tensor(loss) and loss.dim() == 0
+    assert not loss.requires_grad
+    assert isinstance(opt.loss, float)
+    assert opt.loss == loss.item()
+
+
+@pytest.mark.parametrize("flag", ["compile", "cuda_graphs"])
+def test_optimizer_compile_is_cuda_only(flag):
+    from autoforge.Loss.LossFunctions import loss_fn
+
+    opt = _make_optimizer(**{flag: True})
+    assert opt._loss_fn is loss_fn
+    assert opt._tau_buf is None
+    assert isinstance(opt.step(), float)
+
+
+def test_compiled_loss_takes_tensor_taus_without_recompiling():
+    from torch._dynamo.testing import CompileCounter
+    from autoforge.Loss.LossFunctions import loss_fn
+
+    torch.manual_seed(0)
+    params = {
+        "pixel_height_logits": torch.randn(6, 6),
+        "global_logits": torch.randn(3, 2),
+    }
+    kwargs = dict(
+        target=torch.rand(6, 6, 3) * 255,
+        h=0.2,
+        max_layers=3,
+        material_colors=torch.rand(2, 3),
+        material_TDs=torch.ones(2),
+        background=torch.rand(3),
+    )
+    counter = CompileCounter()
+    compiled = torch.compile(loss_fn, backend=counter, dynamic=False)
+    taus = torch.ones(2)
+    for tau_h, tau_g in [(1.0, 1.0), (0.6, 0.4), (0.0, 0.05)]:
+        torch.manual_seed(1)
+        expected = loss_fn(params, tau_height=tau_h, tau_global=tau_g, **kwargs)
+        taus[0].fill_(tau_h)
+        taus[1].fill_(tau_g)
+        torch.manual_seed(1)
+        got = compiled(params, tau_height=taus[0], tau_global=taus[1], **kwargs)
+        assert torch.allclose(got, expected, rtol=1e-4)
+    assert counter.frame_count == 1
+
+
 def test_optimizer_rng_seed_search():
     opt = _make_optimizer()
     # set up a minimal best_params to avoid None paths
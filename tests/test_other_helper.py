@@ -0,0 +1,66 @@
+import types
+
+import numpy as np
+import torch
+
+from autoforge.Helper.OtherHelper import get_device, to_device
+
+
+def _args(device="auto", mps=False):
+    return types.SimpleNamespace(device=device, mps=mps)
+
+
+def test_get_device_explicit_cpu():
+    assert get_device(_args("cpu")).type == "cpu"
+
+
+def test_get_device_auto_prefers_mps_over_cpu(monkeypatch):
+    monkeypatch.setattr(torch.cuda, "is_available", lambda: False)
+    monkeypatch.setattr(torch.backends.mps, "is_available", lambda: True)
+    monkeypatch.setattr(torch.backends.mps, "is_built", lambda: True)
+    assert get_device(_args()).type == "mps"
+
+
+def test_get_device_falls_back_when_unavailable(monkeypatch):
+    monkeypatch.setattr(torch.cuda, "is_available", lambda: False)
+    monkeypatch.setattr(torch.backends.mps, "is_available", lambda: False)
+    assert get_device(_args("cuda")).type == "cpu"
+    assert get_device(_args(mps=True)).type == "cpu"
+
+
+def test_to_device_converts_and_does_not_alias_on_cpu():
+    arr = np.arange(12, dtype=np.float32).reshape(3, 4)
+    t = to_device(arr, torch.device("cpu"))
+    assert t.dtype == torch.float32 and t.shape == (3, 4)
+    arr[0, 0] = 100.0
+    assert t[0, 0].item() == 0.0
+
+    img = np.full((2, 2, 3), 255, dtype=np.uint8)
+    assert torch.equal(
+        to_device(img, torch.device("cpu")), torch.full((2, 2, 3), 255.0)
+    )
+    labels = to_device(np.ones((2, 2)), torch.device("cpu"), dtype=torch.int32)
+    assert labels.dtype == torch.int32
+
+
+def test_to_device_uploads_float64_cast_on_host(monkeypatch):
+    uploaded = []
+    original_to = torch.Tensor.to
+
+    def recording_to(self, *args, **kwargs):
+        out = original_to(self, *args, **kwargs)
+        if self.device.type == "cpu" and out.device.type == "meta":
+            uploaded.append(self.dtype)
+        return out
+
+    monkeypatch.setattr(torch.Tensor, "to", recording_to)
+    meta = torch.device("meta")
+
+    colors = to_device(np.random.rand(4, 3), meta)
+    assert colors.dtype == torch.float32
+    assert uploaded == [torch.float32]
+
+    uploaded.clear()
+    img = to_device(np.zeros((2, 2, 3), dtype=np.uint8), meta)
+    assert img.dtype == torch.float32
+    assert uploaded == [torch.uint8]
@@ -103,3 +103,11 @@ def test_generate_stl_basic(tmp_path):
     assert out_path.exists()
     # basic size check (header 80 + uint32 count + triangles)
     assert out_path.stat().st_size > 84
+
+
+def test_generate_stl_leaves_no_partial_file(tmp_path):
+    height_map = np.random.rand(5, 7).astype(np.float32)
+    out_path = tmp_path / "out.stl"
+    generate_stl(height_map, str(out_path), background_height=0.2, maximum_x_y_size=50)
+    assert [p.name for p in tmp_path.iterdir()] == ["out.stl"]
+    assert len(trimesh.load(out_path).faces) > 0